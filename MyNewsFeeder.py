@@ -3,22 +3,33 @@ __author__  = "Morgoth01"
 __version__ = "0.1.0"
 
 
+import sys
+
+if __name__ == '__main__':
+    # Frozen builds re-launch this executable for parse worker processes
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+if __name__ == '__main__' and '--headless' in sys.argv[1:]:
+    # Server/refresh-worker mode: runs the fetch pipeline without importing Tk. feedcore stands in
+    # as the main module, so spawned parse workers re-import it instead of this GUI script
+    import feedcore
+    sys.modules['__main__'] = feedcore
+    sys.exit(feedcore.main(sys.argv[1:]))
+
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog, font
-import urllib.request
-from urllib.error import HTTPError, URLError
-import xml.etree.ElementTree as ET
 import json
 import webbrowser
-import html
 import threading
-import re
+import queue
 import os
-import sys
-from datetime import datetime
 import time
-import gzip
-import io
+from datetime import datetime
+from feedcore import (APPDATA_PATH, FEED_FILE, SETTINGS_FILE, STATS_FILE, SNAPSHOT_FILE, JsonWriter, FeedCache,
+                      ArticleStore, FeedScheduler, FeedHealth, Article, newest_first, load_settings, load_feeds, fetch_all,
+                      parse_pool, read_opml, write_opml, merge_feeds, probe_feeds, snapshot, load_snapshot,
+                      local_time, clean_text)
 
 def resource_path(rel_path):
     if getattr(sys, 'frozen', False):
@@ -28,50 +39,27 @@ def resource_path(rel_path):
         base = os.path.dirname(__file__)
     return os.path.join(base, rel_path)
 
-# Paths for persistence
-APPDATA_PATH = os.path.join(os.getenv('APPDATA'), 'MyNewsFeeder')
 os.makedirs(APPDATA_PATH, exist_ok=True)
-FEED_FILE = os.path.join(APPDATA_PATH, 'feeds.json')
-SETTINGS_FILE = os.path.join(APPDATA_PATH, 'settings.json')
-
-# Default settings
-DEFAULT_SETTINGS = {
-    'dark_mode': False,
-    'auto_refresh': False,
-    'layout_mode': 'vertical',
-    'max_items': 10,
-    'keyword': '',
-    'font_size': 12,
-    'tree_width': 150,
-    'refresh_interval': 60
-}
 
 # Load settings
-def load_settings():
-    if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
-            settings = json.load(f)
-        for k, v in DEFAULT_SETTINGS.items():
-            settings.setdefault(k, v)
-        return settings
-    return DEFAULT_SETTINGS.copy()
-
 SETTINGS = load_settings()
+SETTINGS_WRITER = JsonWriter(SETTINGS_FILE)
 
-# Load feeds
-def load_feeds():
-    if os.path.exists(FEED_FILE):
-        with open(FEED_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
+def save_settings():
+    SETTINGS_WRITER.save(SETTINGS)
 
+# Load feeds
 FEEDS = load_feeds()
+FEEDS_WRITER = JsonWriter(FEED_FILE)
 
 class FeedManager(simpledialog.Dialog):
     """Dialog for managing RSS/Atom feeds."""
     def __init__(self, parent):
         self.parent = parent
         self.feeds = [f.copy() for f in FEEDS]
+        # Latest probe result per feed URL, and the probe run in progress (its stop event)
+        self.checks = {}
+        self._checking = None
         super().__init__(parent, title='Manage Feeds')
 
     def buttonbox(self):
@@ -90,7 +78,8 @@ class FeedManager(simpledialog.Dialog):
             style.map(w, background=[('active', bg)], foreground=[('active', fg)])
         frame.configure(background=bg)
 
-        cols = [('enabled','Enabled',50), ('name','Name',150), ('url','URL',SETTINGS['tree_width'])]
+        cols = [('enabled','Enabled',50), ('name','Name',150), ('url','URL',SETTINGS['tree_width']),
+                ('folder','Folder',100), ('status','Status',150)]
         for i, (c, txt, wdt) in enumerate(cols):
              ttk.Label(frame, text=txt, background=bg, foreground=fg)
 
@@ -121,16 +110,21 @@ class FeedManager(simpledialog.Dialog):
         menu.add_separator()
         menu.add_command(label='Import…', command=self._import)
         menu.add_command(label='Export…', command=self._export)
+        menu.add_separator()
+        menu.add_command(label='Check Feeds', command=self._check)
         mb.pack(side='left', padx=5)
         ttk.Button(bar, text='OK', command=self.ok).pack(side='left', padx=20)
         ttk.Button(bar, text='Cancel', command=self.cancel).pack(side='left', padx=5)
+        self.note = ttk.Label(frame, text='', background=bg, foreground=fg)
+        self.note.grid(row=3, column=0, columnspan=3, sticky='w')
         return frame
 
     def _refresh(self):
         self.tree.delete(*self.tree.get_children())
-        for f in self.feeds:
+        for i, f in enumerate(self.feeds):
             mark = '✔' if f.get('enabled', True) else ''
-            self.tree.insert('', 'end', values=(mark, f['name'], f['url']))
+            status = self.checks.get(f['url'], {}).get('detail', '')
+            self.tree.insert('', 'end', iid=str(i), values=(mark, f['name'], f['url'], f.get('folder', ''), status))
 
     def _add(self):
         name = simpledialog.askstring('Feed Name','Enter name:', parent=self)
@@ -177,23 +171,196 @@ class FeedManager(simpledialog.Dialog):
                 self._save()
 
     def _import(self):
-        fn = filedialog.askopenfilename(filetypes=[('JSON','*.json')])
-        if fn:
-            with open(fn,'r',encoding='utf-8') as f:
-                self.feeds = json.load(f)
-            self._refresh(); self._save()
+        """Add the feeds of an OPML or JSON file, skipping URLs already in the list."""
+        fn = filedialog.askopenfilename(filetypes=[('OPML','*.opml *.xml'),('JSON','*.json')], parent=self)
+        if not fn:
+            return
+        try:
+            if fn.lower().endswith('.json'):
+                with open(fn,'r',encoding='utf-8') as f:
+                    new = json.load(f)
+            else:
+                new = read_opml(fn)
+            self.feeds, added, dupes = merge_feeds(self.feeds, new)
+        except (OSError, ValueError, SyntaxError) as e:
+            messagebox.showerror('Import', f'Could not import {os.path.basename(fn)}:\n{e}', parent=self)
+            return
+        self._refresh(); self._save()
+        msg = f'Imported {len(added)} feeds, skipped {dupes} already in the list.'
+        if added and messagebox.askyesno('Import', msg + '\n\nCheck the imported feeds now?', parent=self):
+            self._check(added)
+        elif not added:
+            messagebox.showinfo('Import', msg, parent=self)
 
     def _export(self):
-        fn = filedialog.asksaveasfilename(defaultextension='.json',filetypes=[('JSON','*.json')])
-        if fn:
+        fn = filedialog.asksaveasfilename(defaultextension='.opml',filetypes=[('OPML','*.opml'),('JSON','*.json')], parent=self)
+        if not fn:
+            return
+        if fn.lower().endswith('.json'):
             with open(fn,'w',encoding='utf-8') as f:
                 json.dump(self.feeds,f,indent=2)
+        else:
+            write_opml(self.feeds, fn)
+
+    def _check(self, feeds=None):
+        """Probe `feeds` (all by default) in the background, showing results in batches."""
+        if self._checking:
+            return
+        feeds = [f.copy() for f in (self.feeds if feeds is None else feeds)]
+        self._checking = stop = threading.Event()
+        self._results = results = queue.Queue()
+        self._progress = [0, len(feeds)]
+
+        def run():
+            probe_feeds(feeds, lambda f, r: results.put((f['url'], r)), SETTINGS['max_workers'],
+                        SETTINGS['per_host'], stop=stop)
+            results.put(None)
+        threading.Thread(target=run, daemon=True).start()
+        self._drain()
+
+    def _drain(self, batch=200):
+        if not self.winfo_exists():
+            return
+        rows = {f['url']: str(i) for i, f in enumerate(self.feeds)}
+        for _ in range(batch):
+            try:
+                item = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._checked()
+                return
+            url, r = item
+            self.checks[url] = r
+            self._progress[0] += 1
+            if url in rows:
+                self.tree.set(rows[url], 'status', r['detail'])
+        self.note.configure(text='Checked {}/{} feeds'.format(*self._progress))
+        self.after(100, self._drain)
+
+    def _checked(self):
+        """Sum up a finished check and offer to fix moved and dead feeds."""
+        self._checking = None
+        count = {}
+        for r in self.checks.values():
+            count[r['status']] = count.get(r['status'], 0) + 1
+        self.note.configure(text=', '.join(f'{n} {st}' for st, n in sorted(count.items())))
+        fix = [f for f in self.feeds if self.checks.get(f['url'], {}).get('status') in ('moved', 'found')]
+        dead = [f for f in self.feeds if self.checks.get(f['url'], {}).get('status') == 'dead' and f.get('enabled', True)]
+        if not (fix or dead):
+            return
+        if messagebox.askyesno('Check Feeds', f'Update {len(fix)} moved or discovered feed URLs '
+                               f'and disable {len(dead)} dead feeds?', parent=self):
+            for f in fix:
+                r = self.checks.pop(f['url'])
+                f['url'] = r['new_url']
+                self.checks[f['url']] = {'status':'ok', 'detail':'OK (updated)'}
+            for f in dead:
+                f['enabled'] = False
+            self._refresh(); self._save()
+
+    def destroy(self):
+        if self._checking:
+            self._checking.set()
+        super().destroy()
 
     def _save(self):
         global FEEDS
         FEEDS = [f.copy() for f in self.feeds]
-        with open(FEED_FILE,'w',encoding='utf-8') as f:
-            json.dump(FEEDS,f,indent=2)
+        FEEDS_WRITER.save(FEEDS)
+
+class FeedStats(tk.Toplevel):
+    """Per-feed fetch timings and sizes from the latest refresh of each feed."""
+    COLS = [('feed','Feed',160), ('status','Status',60), ('items','Items',50),
+            ('raw_kb','KB wire',70), ('kb','KB',70), ('connect','Connect ms',80),
+            ('ttfb','TTFB ms',70), ('download','Download ms',90), ('decompress','Gunzip ms',80),
+            ('parse','Parse ms',70), ('filter','Filter ms',70), ('total','Total ms',70)]
+
+    def __init__(self, parent, stats):
+        super().__init__(parent)
+        self.title('Feed stats')
+        self.geometry('1000x400')
+        self.rows = [self._row(s) for s in stats]
+        self.tree = ttk.Treeview(self, columns=[c for c,_,__ in self.COLS], show='headings')
+        for c, txt, w in self.COLS:
+            self.tree.heading(c, text=txt, command=lambda c=c: self._sort(c))
+            self.tree.column(c, width=w, anchor='w' if c=='feed' else 'e', stretch=c=='feed')
+        self.tree.pack(fill='both', expand=True, padx=5, pady=5)
+        self._sort('total')
+
+    @staticmethod
+    def _row(s):
+        ms = lambda k: round(s.get(k, 0) * 1000)
+        return (s['feed'], s.get('status',''), s.get('items',0), round(s.get('raw_bytes',0) / 1024, 1),
+                round(s.get('bytes',0) / 1024, 1), ms('connect'), ms('ttfb'), ms('download'),
+                ms('decompress'), ms('parse'), ms('filter'), ms('total'))
+
+    def _sort(self, col):
+        # Heaviest first, except names which sort A–Z
+        i = [c for c,_,__ in self.COLS].index(col)
+        self.rows.sort(key=lambda r: r[i], reverse=col not in ('feed', 'status'))
+        self.tree.delete(*self.tree.get_children())
+        for r in self.rows:
+            self.tree.insert('', 'end', values=r)
+
+class FeedHealthView(tk.Toplevel):
+    """Failing and paused feeds (see FeedHealth), with retry and disable actions."""
+    COLS = [('feed','Feed',160), ('state','State',80), ('failures','Failures',60), ('error','Last error',260),
+            ('last_ok','Last OK',130), ('retry','Next try',130), ('agent','User-Agent',200)]
+    ORDER = {'paused':0, 'probe due':1, 'failing':2, 'ok':3}
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.parent = parent
+        self.title('Feed health')
+        self.geometry('1000x400')
+        self.tree = ttk.Treeview(self, columns=[c for c,_,__ in self.COLS], show='headings')
+        for c, txt, w in self.COLS:
+            self.tree.heading(c, text=txt)
+            self.tree.column(c, width=w, anchor='e' if c=='failures' else 'w', stretch=c=='error')
+        self.tree.pack(fill='both', expand=True, padx=5, pady=5)
+        btns = ttk.Frame(self)
+        btns.pack(fill='x', padx=5, pady=(0, 5))
+        ttk.Button(btns, text='Retry now', command=self._retry).pack(side='left', padx=5)
+        ttk.Button(btns, text='Disable', command=self._disable).pack(side='left', padx=5)
+        ttk.Button(btns, text='Close', command=self.destroy).pack(side='right', padx=5)
+        self._fill()
+
+    def _fill(self):
+        health = self.parent.health
+        rows = []
+        for f in FEEDS:
+            if not f.get('enabled', True):
+                continue
+            st = health.feeds.get(f['url'], {})
+            state = health.state(f['url'])
+            when = lambda k: local_time(st[k]) if st.get(k) else ''
+            rows.append((f['url'], (f['name'], state, st.get('failures', 0), st.get('error', ''), when('last_ok'),
+                                    when('retry') if state in ('paused', 'probe due') else '',
+                                    health.agent(f['url']) or '')))
+        # Worst first
+        rows.sort(key=lambda r: (self.ORDER[r[1][1]], -r[1][2], r[1][0].lower()))
+        self.tree.delete(*self.tree.get_children())
+        for url, values in rows:
+            self.tree.insert('', 'end', iid=url, values=values)
+
+    def _retry(self):
+        urls = set(self.tree.selection())
+        for url in urls:
+            self.parent.health.reset(url)
+        self.parent._refresh_feeds([f for f in FEEDS if f['url'] in urls])
+        self._fill()
+
+    def _disable(self):
+        urls = set(self.tree.selection())
+        if not urls:
+            return
+        for f in FEEDS:
+            if f['url'] in urls:
+                f['enabled'] = False
+        FEEDS_WRITER.save(FEEDS)
+        self.parent._search()
+        self._fill()
 
 class NewsViewer(tk.Tk):
     def __init__(self):
@@ -209,13 +376,42 @@ class NewsViewer(tk.Tk):
         self.max_items        = tk.IntVar(value=SETTINGS['max_items'])
         self.keyword          = tk.StringVar(value=SETTINGS['keyword'])
         self.font_size        = tk.IntVar(value=SETTINGS['font_size'])
+        self.virtual_list     = tk.BooleanVar(value=SETTINGS['virtual_list'])
+        self.newest_first     = tk.BooleanVar(value=SETTINGS['newest_first'])
         self.detail_font      = font.Font(size=self.font_size.get())
         self.current_articles = []
+        self.articles         = {}
         self.current_link     = None
-
+        self._populating      = False
+        self._populate_again  = False
+        self._loaded          = {}
+        self._paging          = False
+        self.store            = ArticleStore()
+        self.cache            = FeedCache(articles=self.store)
+        self.errors           = {}
+        self._search_job      = None
+        self.scheduler        = FeedScheduler(SETTINGS['refresh_interval'], SETTINGS['max_refresh_interval'])
+        self.health           = FeedHealth(threshold=SETTINGS['failure_threshold'], backoff=SETTINGS['failure_backoff'],
+                                           ceiling=SETTINGS['max_failure_backoff'])
+        self._refreshing      = False
+        self._refresh_pending = False
+        self.feed_stats       = {}
+        self.stats_writer     = JsonWriter(STATS_FILE)
+        self.snapshot_writer  = JsonWriter(SNAPSHOT_FILE, delay=2.0, indent=None, copy=False)
+        self._reconcile_job   = None
+        self.parse_processes  = tk.IntVar(value=SETTINGS['parse_processes'])
+        self.parser           = parse_pool(SETTINGS['parse_processes'])
+        # Pools replaced while a refresh was using them; shut down once it ends
+        self._retired_parsers = []
+        # Worker threads never touch Tk; they queue callbacks for _poll_inbox
+        self._inbox           = queue.Queue()
+
+        self.protocol('WM_DELETE_WINDOW', self._on_close)
         self._build_ui()
         self._apply_theme()
+        self._show_snapshot()
         self.update_layout()
+        self._poll_inbox()
         self._start_auto_refresh()
 
     def _build_ui(self):
@@ -232,22 +428,30 @@ class NewsViewer(tk.Tk):
         ttk.Label(self.toolbar, text='Keyword:').pack(side='left', padx=5)
         self.key_entry = ttk.Entry(self.toolbar, textvariable=self.keyword, width=20)
         self.key_entry.pack(side='left', padx=5)
+        self.key_entry.bind('<KeyRelease>', self._on_keyword)
         ttk.Button(self.toolbar, text='Refresh', command=self.update_layout).pack(side='left', padx=5)
         mb = ttk.Menubutton(self.toolbar, text='Options ▾')
         m = tk.Menu(mb, tearoff=False)
         mb['menu'] = m
         m.add_checkbutton(label='Dark Mode', variable=self.dark_mode, command=self._apply_theme)
         m.add_checkbutton(label='Auto Refresh', variable=self.auto_refresh)
+        m.add_checkbutton(label='Virtual List', variable=self.virtual_list, command=self._toggle_virtual)
+        m.add_checkbutton(label='All Feeds, Newest First', variable=self.newest_first, command=self._toggle_newest)
         m.add_separator()
         m.add_command(label='Max items...', command=lambda: self._prompt_int('Max items', self.max_items, 1, 100, self.update_layout))
         m.add_command(label='Font size...', command=lambda: self._prompt_int('Font size', self.font_size, 8, 32, self._apply_font_size))
         m.add_command(label='Refresh interval...', command=lambda: self._prompt_int('Refresh interval', self.refresh_interval, 10, 3600, self.update_layout))
+        m.add_command(label='Parse processes...', command=lambda: self._prompt_int('Parse processes', self.parse_processes, 0, os.cpu_count() or 1, self._set_parse_processes))
+        m.add_command(label='Feed stats...', command=lambda: FeedStats(self, list(self.feed_stats.values())))
+        m.add_command(label='Feed health...', command=lambda: FeedHealthView(self))
         m.add_separator()
         lm = tk.Menu(m, tearoff=False)
         lm.add_radiobutton(label='Vertical', variable=self.layout_mode, value='vertical',   command=self._toggle_layout)
         lm.add_radiobutton(label='Horizontal', variable=self.layout_mode, value='horizontal', command=self._toggle_layout)
         m.add_cascade(label='Layout', menu=lm)
         mb.pack(side='left', padx=5)
+        self.status = ttk.Label(self.toolbar, text='')
+        self.status.pack(side='right', padx=5)
         self._build_pane()
 
     def _show_about(self):
@@ -275,7 +479,15 @@ class NewsViewer(tk.Tk):
         self.tree.column('#0', width=w)
         self.tree.pack(fill='both', expand=True)
         self.tree.bind('<<TreeviewSelect>>', self._on_select)
+        self.tree.bind('<<TreeviewOpen>>', self._on_open)
+        self.tree.bind('<<TreeviewClose>>', self._on_close_group)
         self.tree.bind('<Configure>', self._save_width)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        # Rendered state for incremental updates: iid -> text, parent iid -> child iids
+        self._rendered = {}
+        self._order = {}
+        # Virtual list: rows paged into each expanded group so far
+        self._loaded = {}
         right = ttk.Frame(self)
         self.pw.add(right, weight=2)
         right.rowconfigure(0, weight=1)
@@ -286,9 +498,10 @@ class NewsViewer(tk.Tk):
         self.open_btn.grid(row=1, column=0, sticky='ew', pady=5)
 
     def _save_width(self, event=None):
-        SETTINGS['tree_width'] = self.tree.winfo_width()
-        with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(SETTINGS, f, indent=2)
+        w = self.tree.winfo_width()
+        if SETTINGS.get('tree_width') != w:
+            SETTINGS['tree_width'] = w
+            save_settings()
 
     def _apply_theme(self):
         dark = self.dark_mode.get()
@@ -328,8 +541,7 @@ class NewsViewer(tk.Tk):
     def _apply_font_size(self):
         sz = self.font_size.get()
         SETTINGS['font_size'] = sz
-        with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(SETTINGS, f, indent=2)
+        save_settings()
         self.detail_font.configure(size=sz)
         self.detail.configure(font=self.detail_font)
 
@@ -337,8 +549,7 @@ class NewsViewer(tk.Tk):
         new = 'vertical' if self.layout_mode.get() == 'vertical' else 'horizontal'
         self.layout_mode.set(new)
         SETTINGS['layout_mode'] = new
-        with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(SETTINGS, f, indent=2)
+        save_settings()
         self._build_pane()
         self.update_layout()
 
@@ -346,102 +557,69 @@ class NewsViewer(tk.Tk):
         FeedManager(self)
         self.update_layout()
 
-    def _fetch_articles(self):
-        arts = []
-        kw = self.keyword.get().lower()
-        mx = self.max_items.get()
-        for f in FEEDS:
-            if not f.get('enabled', True):
-                continue
-            url = f['url']
-            try:
-                # Reddit support
-                if 'reddit.com' in url and url.endswith('.rss'):
-                    sub = re.search(r'/r/([^/]+)/', url)
-                    if sub:
-                        api = f"https://www.reddit.com/r/{sub.group(1)}/new.json?limit={mx}"
-                        req = urllib.request.Request(api, headers={'User-Agent':'Mozilla/5.0'})
-                        data = urllib.request.urlopen(req, timeout=10).read().decode()
-                        for p in json.loads(data)['data']['children']:
-                            d = p['data']
-                            t = d.get('title','')
-                            txt = re.sub(r'<[^>]+>', '', d.get('selftext','')).strip()
-                            if kw and kw not in t.lower() and kw not in txt.lower():
-                                continue
-                            link = d.get('url','')
-                            pub = datetime.fromtimestamp(d.get('created_utc',0)).strftime('%Y-%m-%d %H:%M:%S')
-                            arts.append({'feed':f['name'],'title':t,'desc':html.unescape(txt),'link':link,'pub':pub})
-                        continue
-                # Standard RSS/Atom
-                req = urllib.request.Request(url, headers={
-                    'User-Agent':'Mozilla/5.0',
-                    'Accept':'application/rss+xml,application/xml;q=0.9,*/*;q=0.8',
-                    'Accept-Encoding':'gzip'
-                })
-                resp = urllib.request.urlopen(req, timeout=10)
-                raw = resp.read()
-                data = gzip.GzipFile(fileobj=io.BytesIO(raw)).read() if resp.getheader('Content-Encoding','').lower()=='gzip' else raw
-                root = ET.fromstring(data)
-                items = root.findall('.//item') or root.findall('.//entry')
-                cnt = 0
-                for it in items:
-                    t = it.findtext('title') or ''
-                    desc = it.findtext('description') or it.findtext('summary') or ''
-                    pubd = it.findtext('pubDate') or it.findtext('updated') or ''
-                    try:
-                        dt = datetime.fromisoformat(pubd.replace('Z','+00:00'))
-                        pub = dt.astimezone().strftime('%Y-%m-%d %H:%M:%S')
-                    except:
-                        pub = pubd
-                    txt = re.sub(r'<[^>]+>', '', desc).strip()
-                    if kw and kw not in t.lower() and kw not in txt.lower():
-                        continue
-                    link = it.findtext('link') or it.find('{http://www.w3.org/2005/Atom}link').attrib.get('href','')
-                    arts.append({'feed':f['name'],'title':t,'desc':html.unescape(txt),'link':link,'pub':pub})
-                    cnt += 1
-                    if cnt >= mx:
-                        break
-            except HTTPError as e:
-                # Retry on 403 with alt UA
-                if e.code == 403:
-                    try:
-                        alt_req = urllib.request.Request(url, headers={
-                            'User-Agent':'Mozilla/5.0 (compatible; MyNewsFeeder/1.0)',
-                            'Accept':'application/rss+xml,application/xml;q=0.9,*/*;q=0.8'
-                        })
-                        alt_resp = urllib.request.urlopen(alt_req, timeout=10)
-                        alt_raw = alt_resp.read()
-                        alt_data = gzip.GzipFile(fileobj=io.BytesIO(alt_raw)).read() if alt_resp.getheader('Content-Encoding','').lower()=='gzip' else alt_raw
-                        alt_root = ET.fromstring(alt_data)
-                        alt_items = alt_root.findall('.//item') or alt_root.findall('.//entry')
-                        cnt2 = 0
-                        for it2 in alt_items:
-                            t2 = it2.findtext('title') or ''
-                            desc2 = it2.findtext('description') or it2.findtext('summary') or ''
-                            pubd2 = it2.findtext('pubDate') or it2.findtext('updated') or ''
-                            try:
-                                dt2 = datetime.fromisoformat(pubd2.replace('Z','+00:00'))
-                                pub2 = dt2.astimezone().strftime('%Y-%m-%d %H:%M:%S')
-                            except:
-                                pub2 = pubd2
-                            txt2 = re.sub(r'<[^>]+>', '', desc2).strip()
-                            if kw and kw not in t2.lower() and kw not in txt2.lower():
-                                continue
-                            link2 = it2.findtext('link') or it2.find('{http://www.w3.org/2005/Atom}link').attrib.get('href','')
-                            arts.append({'feed':f['name'],'title':t2,'desc':html.unescape(txt2),'link':link2,'pub':pub2})
-                            cnt2 += 1
-                            if cnt2 >= mx:
-                                break
-                        continue
-                    except Exception:
-                        arts.append({'feed':f['name'],'title':'[ERROR] HTTP 403 Forbidden','desc':'','link':'','pub':''})
-                        continue
-                arts.append({'feed':f['name'],'title':f'[ERROR] HTTP {e.code}','desc':'','link':'','pub':''})
-            except URLError as e:
-                arts.append({'feed':f['name'],'title':f'[ERROR] URL {e.reason}','desc':'','link':'','pub':''})
-            except Exception as e:
-                arts.append({'feed':f['name'],'title':f'[ERROR] {e}','desc':'','link':'','pub':''})
-        return arts
+    def _fetch_articles(self, feeds, info, parser, mx):
+        # Keyword filtering happens in the store, so fetch everything
+        return fetch_all(feeds, '', mx,
+                         SETTINGS['max_workers'], SETTINGS['per_host'], SETTINGS['refresh_deadline'],
+                         cache=self.cache, max_bytes=SETTINGS['max_feed_bytes'], info=info, parser=parser,
+                         progress=lambda f, arts, done, total: self._fetched(f, arts, info, done, total),
+                         health=self.health)
+
+    def _fetched(self, f, arts, info, done, total):
+        """Take in one feed's articles as soon as its fetch completes (on a fetch thread)."""
+        self.scheduler.update(f, arts, info.get(f['url']))
+        err = [a for a in arts if a.get('error')]
+        if err:
+            self.errors[f['name']] = Article.from_dict(err[0])
+        else:
+            self.errors.pop(f['name'], None)
+        self.store.add(arts, SETTINGS['retention_days'])
+        self._inbox.put((self._feed_done, (done, total)))
+
+    def _feed_done(self, done, total):
+        if not self._refreshing:
+            return
+        self.status.configure(text=f'Refreshing {done}/{total} feeds...')
+        # Fold finished feeds into the view every half second rather than once per feed
+        if self._reconcile_job is None:
+            self._reconcile_job = self.after(500, self._reconcile)
+
+    def _reconcile(self):
+        self._reconcile_job = None
+        if self._refreshing:
+            self._search()
+
+    def _show_snapshot(self):
+        """Show the articles saved after the last refresh, before anything is fetched."""
+        saved, arts = load_snapshot()
+        if not arts:
+            return
+        names = {f['name'] for f in FEEDS if f.get('enabled', True)}
+        arts = [a for a in arts if a.feed in names]
+        self.current_articles = newest_first(arts) if self.newest_first.get() else arts
+        self._populate_tree()
+        self.status.configure(text=f'Saved articles from {local_time(saved)}')
+
+    def _set_parse_processes(self):
+        n = self.parse_processes.get()
+        SETTINGS['parse_processes'] = n
+        save_settings()
+        old, self.parser = self.parser, parse_pool(n)
+        if old and self._refreshing:
+            # The refresh in flight keeps submitting to the old pool until it ends
+            self._retired_parsers.append(old)
+        elif old:
+            old.shutdown(wait=False)
+
+    def _poll_inbox(self):
+        """Run the callbacks queued by worker threads, on the Tk thread."""
+        try:
+            while True:
+                fn, args = self._inbox.get_nowait()
+                fn(*args)
+        except queue.Empty:
+            pass
+        self.after(50, self._poll_inbox)
 
     def update_layout(self, *args):
         SETTINGS.update({
@@ -451,54 +629,275 @@ class NewsViewer(tk.Tk):
             'max_items':    self.max_items.get(),
             'keyword':      self.keyword.get(),
             'font_size':    self.font_size.get(),
-            'refresh_interval': self.refresh_interval.get()
+            'refresh_interval': self.refresh_interval.get(),
+            'virtual_list': self.virtual_list.get(),
+            'newest_first': self.newest_first.get()
         })
         try:
             SETTINGS['tree_width'] = self.tree.column('#0')['width']
         except:
             pass
-        with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(SETTINGS, f, indent=2)
+        save_settings()
         self._apply_theme()
-        threading.Thread(target=self._async, daemon=True).start()
+        self.scheduler.base = self.refresh_interval.get()
+        self._refresh_feeds()
+
+    def _refresh_feeds(self, feeds=None):
+        """Fetch `feeds` (all enabled ones by default) unless a refresh is already running."""
+        if self._refreshing:
+            # A full refresh asked for mid-run is redone once the current one ends
+            self._refresh_pending = self._refresh_pending or feeds is None
+            return
+        self._refreshing = True
+        feeds = [f for f in (FEEDS if feeds is None else feeds) if f.get('enabled', True)]
+        # Tk variables are read here; the refresh thread only gets plain values
+        threading.Thread(target=self._async, args=(feeds, self.parser, self.max_items.get()), daemon=True).start()
+
+    def _async(self, feeds, parser, mx):
+        info = {}
+        started = time.time()
+        # Each feed is stored and scheduled by _fetched() as it arrives
+        self._fetch_articles(feeds, info, parser, mx)
+        self._record_stats(feeds, info, started)
+        self._inbox.put((self._refresh_done, ()))
+
+    def _record_stats(self, feeds, info, started):
+        """Keep each feed's latest fetch metrics and dump them with a refresh summary."""
+        for f in feeds:
+            self.feed_stats[f['url']] = {'feed': f['name'], 'url': f['url'], 'at': started, **info.get(f['url'], {})}
+        self.stats_writer.save({
+            'refresh': {
+                'started': datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+                'wall': time.time() - started,
+                'feeds': len(feeds),
+                'cache': dict(self.cache.stats)
+            },
+            'feeds': sorted(self.feed_stats.values(), key=lambda s: s.get('total', 0), reverse=True)
+        })
 
-    def _async(self):
-        self.current_articles = self._fetch_articles()
-        self.after(0, self._populate_tree)
+    def _refresh_done(self):
+        self._refreshing = False
+        for old in self._retired_parsers:
+            old.shutdown(wait=False)
+        self._retired_parsers.clear()
+        self._search()
+        self.snapshot_writer.save(snapshot(self.current_articles))
+        if self._refresh_pending:
+            self._refresh_pending = False
+            self._refresh_feeds()
+
+    def _on_keyword(self, event=None):
+        if self._search_job:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(150, self._search)
+
+    def _search(self):
+        """Render articles from the local store; no network involved."""
+        self._search_job = None
+        names = [f['name'] for f in FEEDS if f.get('enabled', True)]
+        # Fetch threads update errors meanwhile, so look each one up only once
+        errors = [e for e in map(self.errors.get, names) if e]
+        arts = self.store.query(names, self.keyword.get().strip().lower(), self.max_items.get())
+        self.current_articles = errors + (newest_first(arts) if self.newest_first.get() else arts)
+        self._populate_tree()
 
     def _populate_tree(self):
-        self.tree.delete(*self.tree.get_children())
-        groups = {f['name']: [] for f in FEEDS if f.get('enabled', True)}
-        for i, art in enumerate(self.current_articles):
-            groups.setdefault(art['feed'], []).append((i, art))
-        for name, items in groups.items():
-            pid = self.tree.insert('', 'end', text=name, open=True)
-            for idx, a in items:
-                self.tree.insert(pid, 'end', iid=str(idx), text=a['title'])
+        if not self._refreshing:
+            s = self.cache.stats
+            self.status.configure(text=f"Cache: {s['hit']} fresh, {s['304']} not modified, {s['miss']} downloaded")
+        self.articles = {a.id: a for a in self.current_articles}
+        if self._populating:
+            # Diff again once the update in flight has been applied
+            self._populate_again = True
+            return
+        self._populating = True
+        self._apply_tree_ops(self.tree, self._tree_ops(), 0)
+
+    def _tree_ops(self):
+        """Diff current_articles against the rendered tree and return the Treeview operations.
+
+        Rows are keyed by article id, so unchanged rows (and with them the
+        selection and scroll position) survive a refresh.
+        """
+        if self.newest_first.get():
+            target, labels = self._flat_target()
+        else:
+            target, labels = self._grouped_target()
+        ops = []
+        for parent, old in self._order.items():
+            if parent not in target:
+                continue
+            keep = set(target[parent])
+            ops += [('delete', iid) for iid in old if iid not in keep]
+        for parent, new in target.items():
+            old = [iid for iid in self._order.get(parent, []) if iid in self._rendered]
+            present, wanted = set(old), set(new)
+            reorder = [iid for iid in old if iid in wanted] != [iid for iid in new if iid in present]
+            for i, iid in enumerate(new):
+                text = labels[iid]
+                if iid not in present:
+                    is_open = parent == '' and (not self.virtual_list.get() or iid in self._loaded)
+                    ops.append(('insert', parent, i, iid, text, is_open))
+                else:
+                    if reorder:
+                        ops.append(('move', iid, parent, i))
+                    if self._rendered[iid] != text:
+                        ops.append(('item', iid, text))
+        self._rendered = {iid: labels[iid] for ids in target.values() for iid in ids}
+        self._order = target
+        return ops
+
+    @staticmethod
+    def _title(a):
+        """Row text of an article, with how many feeds carry its story."""
+        return f'{a.title}  [{len(a.sources)} sources]' if a.sources else a.title
+
+    def _flat_target(self):
+        """One list of all feeds' articles in current_articles order (newest first)."""
+        ids, labels = [], {}
+        for a in self.current_articles:
+            if a.id not in labels:
+                ids.append(a.id)
+                labels[a.id] = f'{a.feed}: {self._title(a)}'
+        if self.virtual_list.get():
+            n = self._loaded.setdefault('all', self.PAGE)
+            if len(ids) > n:
+                labels['m:all'] = f'… {len(ids) - n} more'
+                ids = ids[:n] + ['m:all']
+        return {'': ids}, labels
+
+    def _grouped_target(self):
+        """Articles under one node per feed, collapsed to placeholders in virtual mode."""
+        groups = {'g:' + f['name']: [] for f in FEEDS if f.get('enabled', True)}
+        labels = {'g:' + f['name']: f['name'] for f in FEEDS}
+        seen = set()
+        for a in self.current_articles:
+            if a.id not in seen:
+                seen.add(a.id)
+                groups.setdefault('g:' + a.feed, []).append(a.id)
+                labels.setdefault('g:' + a.feed, a.feed)
+                labels[a.id] = self._title(a)
+        target = {'': list(groups)}
+        for g, ids in groups.items():
+            if not self.virtual_list.get():
+                target[g] = ids
+                continue
+            # Collapsed groups hold one placeholder (for the expand arrow) until opened
+            n = self._loaded.get(g, 0)
+            target[g] = ids[:n] if n else (['p:' + g] if ids else [])
+            labels['p:' + g] = '…'
+            if n and len(ids) > n:
+                target[g].append('m:' + g)
+                labels['m:' + g] = f'… {len(ids) - n} more'
+        return target, labels
+
+    def _apply_tree_ops(self, tree, ops, start, chunk=500):
+        """Apply `ops` a chunk at a time across after() callbacks so the UI stays responsive."""
+        if tree is not self.tree:
+            # Pane was rebuilt meanwhile; the new tree starts from scratch
+            ops = []
+        for op in ops[start:start + chunk]:
+            if op[0] == 'delete':
+                if tree.exists(op[1]):
+                    tree.delete(op[1])
+            elif op[0] == 'insert':
+                _, parent, i, iid, text, is_open = op
+                tree.insert(parent, i, iid=iid, text=text, open=is_open)
+            elif op[0] == 'move':
+                tree.move(op[1], op[2], op[3])
+            else:
+                tree.item(op[1], text=op[2])
+        if start + chunk < len(ops):
+            self.after(1, self._apply_tree_ops, tree, ops, start + chunk, chunk)
+            return
+        self._populating = False
+        if self._populate_again:
+            self._populate_again = False
+            self._populate_tree()
+
+    PAGE = 200
+
+    def _toggle_virtual(self):
+        SETTINGS['virtual_list'] = self.virtual_list.get()
+        save_settings()
+        # Group open states differ between the modes, so start from a fresh tree
+        self._build_pane()
+        self._apply_theme()
+        self._populate_tree()
+
+    def _toggle_newest(self):
+        SETTINGS['newest_first'] = self.newest_first.get()
+        save_settings()
+        self._build_pane()
+        self._apply_theme()
+        self._search()
+
+    def _on_open(self, event=None):
+        g = self.tree.focus()
+        if self.virtual_list.get() and g.startswith('g:') and g not in self._loaded:
+            self._loaded[g] = self.PAGE
+            self._populate_tree()
+
+    def _on_close_group(self, event=None):
+        # Drop the rows of a collapsed group; they are paged in again when reopened
+        g = self.tree.focus()
+        if self.virtual_list.get() and self._loaded.pop(g, None):
+            self._populate_tree()
+
+    def _load_more(self, g):
+        self._paging = False
+        if g in self._loaded:
+            self._loaded[g] += self.PAGE
+            self._populate_tree()
+
+    def _on_scroll(self, first, last):
+        # Page in the next window once a group's "more" row scrolls into view
+        if not self.virtual_list.get() or self._populating or self._paging:
+            return
+        for g in self._loaded:
+            if self.tree.exists('m:' + g) and self.tree.bbox('m:' + g):
+                self._paging = True
+                self.after_idle(self._load_more, g)
+                return
 
     def _on_select(self, event=None):
         sel = self.tree.selection()
-        if not sel or not sel[0].isdigit():
+        if sel and sel[0].startswith('m:'):
+            self._load_more(sel[0][2:])
+            return
+        art = self.articles.get(sel[0]) if sel else None
+        if not art:
             return
-        art = self.current_articles[int(sel[0])]
-        details = f"Feed: {art['feed']}\nTitle: {art['title']}\nPublished: {art['pub']}\n\n{art['desc']}"
+        desc = art.desc if art.desc is not None else self.store.description(art.id)
+        feeds = f"Sources: {', '.join(art.sources)}" if art.sources else f"Feed: {art.feed}"
+        details = f"{feeds}\nTitle: {art.title}\nPublished: {art.pub}\n\n{clean_text(desc)}"
         self.detail.config(state='normal')
         self.detail.delete('1.0', 'end')
         self.detail.insert('end', details)
         self.detail.config(state='disabled')
-        self.current_link = art['link']
+        self.current_link = art.link
+
+    def _on_close(self):
+        SETTINGS_WRITER.flush()
+        FEEDS_WRITER.flush()
+        self.snapshot_writer.flush()
+        self.health.writer.flush()
+        for pool in [self.parser] + self._retired_parsers:
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self.destroy()
 
     def _open_link(self):
         if self.current_link:
             webbrowser.open(self.current_link, new=2)
 
     def _start_auto_refresh(self):
-        def loop():
-            while True:
-                if self.auto_refresh.get():
-                    self.update_layout()
-                time.sleep(self.refresh_interval.get())
-        threading.Thread(target=loop, daemon=True).start()
+        # Cheap tick; the scheduler decides which feeds are actually due
+        if self.auto_refresh.get() and not self._refreshing:
+            due = self.scheduler.due(FEEDS)
+            if due:
+                self._refresh_feeds(due)
+        self.after(5000, self._start_auto_refresh)
 
 if __name__ == '__main__':
     NewsViewer().mainloop()
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""Cost of story clustering in ArticleStore.add() as the store grows.
+
+Stories are syndicated to one to three feeds each, with tracking parameters
+on the link, a " - Source" title suffix or a reworded title, the way
+aggregators repeat them. Title words follow a Zipf distribution like real
+headlines, so common words make some title signatures very popular. Time
+per article should stay flat as the number of stored articles grows.
+Usage: python benchmarks/bench_dedupe.py [n ...]
+"""
+import itertools
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feedcore import ArticleStore, article_id
+
+
+def sample(n, n_feeds=200):
+    """About n articles, as (story number, article dict)."""
+    rnd = random.Random(1)
+    vocab = [''.join(rnd.choices(string.ascii_lowercase, k=rnd.randint(3, 9))) for _ in range(20000)]
+    # Zipf: the i-th most common word turns up about 1/i as often as the first
+    weights = list(itertools.accumulate(1 / (i + 1) for i in range(len(vocab))))
+    words_of = lambda k: rnd.choices(vocab, cum_weights=weights, k=k)
+    now = time.time()
+    story = 0
+    while n > 0:
+        words = words_of(rnd.randint(6, 12))
+        link = f'https://news{story % 50}.example.com/{story}'
+        for j in range(min(n, rnd.randint(1, 3))):
+            feed = f'Feed {rnd.randrange(n_feeds)}'
+            title, url = ' '.join(words), link
+            if j == 1:
+                url = link + '?utm_source=rss&utm_medium=feed'
+            elif j == 2:
+                w = list(words)
+                w[rnd.randrange(len(w))] = words_of(1)[0]
+                title, url = ' '.join(w) + ' - ' + feed, f'https://other.example.com/{story}'
+            # A new story every 30 s, so 40k articles span about a week
+            a = {'feed': feed, 'title': title.capitalize(), 'desc': '<p>' + ' '.join(words_of(60)),
+                 'link': url, 'pub': '', 'guid': '', 'ts': now - 30 * story}
+            a['id'] = article_id(feed, a)
+            n -= 1
+            yield story, a
+        story += 1
+
+
+def run(n, batch=50):
+    rows = list(sample(n))
+    with tempfile.TemporaryDirectory() as d:
+        store = ArticleStore(os.path.join(d, 'articles.db'))
+        arts = [a for _, a in rows]
+        t0 = time.perf_counter()
+        for i in range(0, len(arts), batch):
+            store.add(arts[i:i + batch])
+        elapsed = time.perf_counter() - t0
+        stories = store.db.execute('SELECT count(DISTINCT story) FROM articles').fetchone()[0]
+        store.db.close()
+    expected = len({s for s, _ in rows})
+    print(f'{n:8} articles  {elapsed:7.2f} s  {elapsed / n * 1e6:7.0f} us/article  '
+          f'{stories} stories ({expected} generated)')
+
+
+def main(*sizes):
+    for n in sizes or (5000, 10000, 20000, 40000):
+        run(n)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
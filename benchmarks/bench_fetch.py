@@ -0,0 +1,40 @@
+"""Compare serial vs concurrent refresh wall time against local feed servers.
+
+Each server stands in for one host, so the per-host cap applies as it would
+against real sites. Usage: python benchmarks/bench_fetch.py [feeds] [hosts] [latency]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feedcore as app
+from feedserver import FeedServer
+
+
+def main(n_feeds=60, n_hosts=10, latency=0.2):
+    servers = [FeedServer(latency=latency) for _ in range(n_hosts)]
+    feeds = [{'name': f'feed{i}', 'url': servers[i % n_hosts].url(f'/feed{i}.xml'), 'enabled': True}
+             for i in range(n_feeds)]
+    try:
+        t0 = time.perf_counter()
+        serial = [a for f in feeds for a in app.fetch_feed(f, '', 10)]
+        t_serial = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        cfg = app.DEFAULT_SETTINGS
+        conc = app.fetch_all(feeds, '', 10, cfg['max_workers'], cfg['per_host'], cfg['refresh_deadline'])
+        t_conc = time.perf_counter() - t0
+    finally:
+        for s in servers:
+            s.close()
+
+    assert [a['link'] for a in serial] == [a['link'] for a in conc], 'result order differs'
+    print(f'{n_feeds} feeds on {n_hosts} hosts, {latency * 1000:.0f} ms latency')
+    print(f'serial:     {t_serial:7.2f} s')
+    print(f'concurrent: {t_conc:7.2f} s  ({t_serial / t_conc:.1f}x)')
+
+
+if __name__ == '__main__':
+    main(*[float(a) if '.' in a else int(a) for a in sys.argv[1:]])
@@ -0,0 +1,53 @@
+"""Memory held by 100k in-memory articles: plain dicts vs feedcore.Article.
+
+Compares the old dict-per-article layout with Article records holding a
+compressed description, and with Article records whose description stays in
+the ArticleStore (what the GUI keeps). Usage: python benchmarks/bench_memory.py [n]
+"""
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feedcore import Article, article_id
+
+WORDS = ('market report city council weather update election sports science research '
+         'technology release security patch review opinion analysis local world').split()
+
+
+def sample(n, n_feeds=300):
+    rnd = random.Random(1)
+    for i in range(n):
+        # Feed names come back from SQLite/XML as fresh strings, not shared ones
+        feed = ''.join(['Feed number ', str(i % n_feeds)])
+        title = ' '.join(rnd.choices(WORDS, k=8)).capitalize()
+        desc = '<p>' + ' '.join(rnd.choices(WORDS, k=70)) + '</p>'
+        a = {'feed': feed, 'title': title, 'desc': desc, 'link': f'https://example.com/{i % n_feeds}/{i}',
+             'pub': '2025-05-01 12:00:00', 'guid': f'tag:example.com,2025:{i}'}
+        a['id'] = article_id(feed, a)
+        yield a
+
+
+def measure(label, build, n):
+    # Inputs are generated inside the traced window but dropped as we go, so
+    # only what the representation keeps alive is counted.
+    tracemalloc.start()
+    held = build(sample(n))
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:28} {size / 1e6:8.1f} MB  {size / n:6.0f} B/article')
+    return held
+
+
+def main(n=100_000):
+    print(f'{n} articles')
+    measure('dict', list, n)
+    measure('Article (compressed desc)', lambda it: [Article.from_dict(a) for a in it], n)
+    measure('Article (desc in store)',
+            lambda it: [Article(a['id'], a['feed'], a['title'], None, a['link'], a['pub'], a['guid']) for a in it], n)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,98 @@
+"""Per-item parse cost of the item extraction engine on large sample feeds.
+
+Streams big RSS 2.0, RSS 1.0/RDF and Atom documents through
+feedcore._parse_items and reports microseconds per item, both end to end and
+for field extraction alone (on an already parsed tree). For comparison,
+findtext() extraction over the same tags (one scan per candidate tag until
+a field is found) is timed as well.
+Usage: python benchmarks/bench_parse.py [items]
+"""
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feedcore as app
+from feedserver import make_atom, make_rdf, make_rss
+
+
+def make_rich_rss(n_items=20, title='Bench'):
+    """RSS 2.0 shaped like real news feeds: categories, creator, comments, enclosure, no guid."""
+    items = ''.join(
+        f'<item><title>{title} item {i}</title>'
+        f'<link>http://example.invalid/{title}/{i}</link><comments>http://example.invalid/{i}#c</comments>'
+        f'<dc:creator>Reporter {i % 7}</dc:creator>'
+        + ''.join(f'<category>topic {c}</category>' for c in range(6)) +
+        f'<enclosure url="http://example.invalid/{i}.jpg" length="1000" type="image/jpeg"/>'
+        f'<summary>&lt;p&gt;Body of item {i}&lt;/p&gt;</summary>'
+        f'<pubDate>2025-05-01T12:00:{i % 60:02d}Z</pubDate></item>'
+        for i in range(n_items))
+    return ('<?xml version="1.0"?><rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<channel><title>{title}</title>{items}</channel></rss>').encode()
+
+
+# The same fields and precedence as feedcore.ITEM_SLOTS, one findtext() scan per candidate tag
+CHAINS = {}
+for _tag, _slot in app.ITEM_SLOTS.items():
+    CHAINS.setdefault(_slot, []).append(_tag)
+
+
+def findtext_item(it, name):
+    def first(*slots):
+        for s in slots:
+            for tag in CHAINS[s]:
+                v = it.findtext(tag)
+                if v:
+                    return v.strip()
+        return ''
+    pubd = first(5, 6, 7)
+    try:
+        pub = datetime.fromisoformat(pubd.replace('Z', '+00:00')).astimezone().strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        pub = pubd
+    link = first(8)
+    if not link:
+        for e in it.iterfind(app.ATOM + 'link'):
+            if e.get('rel', 'alternate') == 'alternate':
+                link = e.get('href', '')
+                break
+    return {'feed': name, 'title': first(0, 1), 'desc': first(2, 3, 4), 'link': link, 'pub': pub,
+            'guid': first(10, 11) or it.get(app.RDF + 'about', '')}
+
+
+def best_of(fn, rounds=5):
+    best = float('inf')
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def stream(doc, n):
+    chunks = [doc[i:i + 64 * 1024] for i in range(0, len(doc), 64 * 1024)]
+    t, (arts, _) = best_of(lambda: app._parse_items(chunks, 'bench', n + 1, lambda a: True))
+    assert len(arts) == n and arts[-1]['title'] and arts[-1]['link'], arts[-1]
+    return t / n * 1e6
+
+
+def extract(doc, n, item):
+    root = ET.fromstring(doc)
+    items = [e for e in root.iter() if e.tag in app.ITEM_TAGS]
+    t, _ = best_of(lambda: [item(e, 'bench') for e in items])
+    return t / n * 1e6
+
+
+def main(n=20000):
+    docs = {'RSS 2.0': make_rss(n), 'RSS 2.0 rich': make_rich_rss(n), 'RSS 1.0/RDF': make_rdf(n),
+            'Atom': make_atom(n)}
+    print(f'{"":24} {"stream":>9} {"extract":>9} {"findtext":>9}  (us/item)')
+    for label, doc in docs.items():
+        print(f'{label:14} {len(doc) / 1e6:5.1f} MB  {stream(doc, n):9.2f} {extract(doc, n, app._item):9.2f}'
+              f' {extract(doc, n, findtext_item):9.2f}')
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
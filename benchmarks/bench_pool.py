@@ -0,0 +1,43 @@
+"""Show keep-alive connection reuse across feeds and refreshes on one host.
+
+Runs two refreshes of many feeds hosted on one local HTTP/1.1 server, once
+with pooling disabled and once with the shared pool, and reports how many
+TCP connections the server accepted. Bodies are served deflate-encoded to
+exercise that path too. Usage: python benchmarks/bench_pool.py [feeds] [latency]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feedcore as app
+from feedserver import FeedServer
+
+
+def run(pool, n_feeds, latency, refreshes=2):
+    server = FeedServer(latency=latency, keep_alive=True, encoding='deflate')
+    feeds = [{'name': f'feed{i}', 'url': server.url(f'/feed{i}.xml')} for i in range(n_feeds)]
+    app._pool = pool
+    try:
+        t0 = time.perf_counter()
+        for _ in range(refreshes):
+            arts = app.fetch_all(feeds, '', 10, per_host=4)
+            assert not any(a.get('error') for a in arts), arts[0]
+            assert len(arts) == 10 * n_feeds
+        return server.connections, server.requests, time.perf_counter() - t0
+    finally:
+        pool.close()
+        server.close()
+
+
+def main(n_feeds=40, latency=0.01):
+    for label, pool in (('no pooling', app.HTTPPool(max_idle=0)), ('keep-alive', app.HTTPPool())):
+        conns, reqs, wall = run(pool, n_feeds, latency)
+        print(f'{label:10}  {reqs} requests over {conns:3} connections  {wall:6.2f} s')
+    # Two refreshes capped at per_host=4 should never need more than 4 sockets
+    assert conns <= 4, f'expected at most 4 pooled connections, got {conns}'
+
+
+if __name__ == '__main__':
+    main(*[float(a) if '.' in a else int(a) for a in sys.argv[1:]])
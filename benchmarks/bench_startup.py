@@ -0,0 +1,89 @@
+"""Startup time from process start to the first article on screen.
+
+Starts the app in a child process against a local feed server with
+injected latency, in a fresh data folder: once cold (nothing saved, so the
+first article waits for the network) and then warm (the offline snapshot
+written by the cold run), and warm again with the server gone (offline).
+Without a display only the data path is timed: fetching everything versus
+loading the snapshot. Usage: python benchmarks/bench_startup.py [feeds] [latency]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from feedserver import FeedServer
+
+# Runs in the child: time from the parent's t0 to the first article row rendered
+CHILD = r'''
+import sys, time
+t0, cold = float(sys.argv[1]), sys.argv[2] == 'cold'
+sys.path.insert(0, sys.argv[3])
+import MyNewsFeeder as app
+v = app.NewsViewer()
+first = []
+def poll():
+    if not first and any(v.tree.exists(i) for i in v.articles):
+        first.append(time.time() - t0)
+        print(f'{first[0]:.3f}', flush=True)
+    if first and not (cold and v._refreshing):
+        v._on_close()
+        return
+    v.after(5, poll)
+poll()
+v.mainloop()
+'''
+
+
+def child(home, mode):
+    env = {**os.environ, 'MYNEWSFEEDER_HOME': home}
+    t0 = time.time()
+    p = subprocess.run([sys.executable, '-c', CHILD, repr(t0), mode, ROOT], env=env,
+                       capture_output=True, text=True, timeout=300)
+    if p.returncode:
+        raise RuntimeError(p.stderr.strip().splitlines()[-1])
+    return float(p.stdout.split()[0])
+
+
+def data_path(feeds, home):
+    """Display-less fallback: the part of startup the snapshot replaces."""
+    os.environ['MYNEWSFEEDER_HOME'] = home
+    import feedcore as app
+    t0 = time.perf_counter()
+    arts = [app.Article.from_dict(a) for a in app.fetch_all(feeds, '', 10)]
+    fetched = time.perf_counter() - t0
+    path = os.path.join(home, 'snapshot.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(app.snapshot(arts), f, separators=(',', ':'))
+    t0 = time.perf_counter()
+    _, loaded = app.load_snapshot(path)
+    return fetched, time.perf_counter() - t0, len(loaded)
+
+
+def main(n_feeds=200, latency=0.3):
+    server = FeedServer(latency=latency, keep_alive=True, encoding='gzip')
+    feeds = [{'name': f'feed{i}', 'url': server.url(f'/feed{i}.xml'), 'enabled': True} for i in range(n_feeds)]
+    with tempfile.TemporaryDirectory() as home:
+        with open(os.path.join(home, 'feeds.json'), 'w', encoding='utf-8') as f:
+            json.dump(feeds, f)
+        print(f'{n_feeds} feeds, {latency * 1000:.0f} ms latency')
+        try:
+            print(f'cold start (network):   {child(home, "cold"):6.2f} s to first article')
+            print(f'warm start (snapshot):  {child(home, "warm"):6.2f} s')
+            server.close()
+            print(f'warm start, offline:    {child(home, "warm"):6.2f} s')
+        except RuntimeError as e:
+            print(f'GUI not available ({e}); timing the data path only')
+            fetched, loaded, n = data_path(feeds, home)
+            print(f'fetch all feeds:    {fetched:7.3f} s')
+            print(f'load snapshot:      {loaded:7.3f} s  ({n} articles)')
+            server.close()
+
+
+if __name__ == '__main__':
+    main(*[float(a) if '.' in a else int(a) for a in sys.argv[1:]])
@@ -0,0 +1,231 @@
+"""Benchmark suite: refresh, parsing, memory and article tree timings at 10/100/1,000 feeds.
+
+Feeds are spread over local FeedServer hosts as a mix of RSS, Atom, RDF and
+Reddit JSON, some gzipped and some refusing the app's first User-Agent with
+a 403, with injected latency and 503 errors. Bodies carry ETags, so the
+second refresh of each size is answered with 304s. Per feed count it
+measures:
+
+- refresh wall time, items, errors and requests (cold cache), and again
+  revalidating (304)
+- parse throughput (items per second of parse time)
+- peak Python memory of a refresh (tracemalloc, in a separate run)
+- saving and loading feeds.json
+- filling the article tree and refreshing it unchanged (needs a display)
+
+Results are printed and written as JSON; --compare prints the change
+against an earlier results file. Runs in a temporary data folder.
+Usage: python benchmarks/bench_suite.py [--feeds 10 100 1000] [--out PATH] [--compare OLD]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Never touch the user's real feeds, cache or article history
+HOME = tempfile.mkdtemp(prefix='mynewsfeeder-bench-')
+os.environ['MYNEWSFEEDER_HOME'] = HOME
+
+import feedcore as app
+from feedserver import FeedServer
+
+# Feed i gets KINDS[i % len(KINDS)]; every FORBID-th feed 403s the default User-Agent
+KINDS = [('rss', False), ('atom', False), ('rss', True), ('atom', True), ('rdf', False), ('reddit', False)]
+FORBID = 10
+# Metrics where lower is better, for --compare
+LOWER = ('refresh_s', 'revalidate_s', 'peak_mb', 'feeds_save_s', 'feeds_load_s', 'tree_fill_s', 'tree_update_s')
+
+
+def make_feeds(n, servers, reddit):
+    feeds = []
+    for i in range(n):
+        kind, gz = KINDS[i % len(KINDS)]
+        name = f'feed{i}'
+        if kind == 'reddit':
+            url = reddit.feed_url('reddit', name)
+        else:
+            agent = 'MyNewsFeeder' if i % FORBID == FORBID - 1 else None
+            url = servers[i % len(servers)].feed_url(kind, name, gzip=gz, agent=agent)
+        feeds.append({'name': name, 'url': url, 'enabled': True})
+    return feeds
+
+
+def refresh(feeds, args, cache, servers):
+    before = sum(s.requests for s in servers)
+    info = {}
+    t0 = time.perf_counter()
+    arts = app.fetch_all(feeds, '', args.items, args.workers, args.per_host, cache=cache, info=info)
+    wall = time.perf_counter() - t0
+    statuses = {}
+    for m in info.values():
+        statuses[m['status']] = statuses.get(m['status'], 0) + 1
+    errors = sum(1 for a in arts if a.get('error'))
+    return arts, {'wall': wall, 'items': len(arts) - errors, 'errors': errors,
+                  'requests': sum(s.requests for s in servers) - before, 'statuses': statuses,
+                  'parse': sum(m['parse'] for m in info.values())}
+
+
+def tree_times(feeds, arts):
+    """Seconds to fill the article tree, and to refresh it with nothing changed; None without a display."""
+    import tkinter as tk
+    import MyNewsFeeder as gui
+
+    class Viewer(gui.NewsViewer):
+        # Only the tree is timed: no saved snapshot, no refresh (of servers already closed), no auto-refresh
+        def _show_snapshot(self):
+            pass
+
+        def update_layout(self, *args):
+            pass
+
+        def _refresh_feeds(self, feeds=None):
+            pass
+
+        def _start_auto_refresh(self):
+            pass
+
+    try:
+        v = Viewer()
+    except tk.TclError:
+        return None, None
+    try:
+        gui.FEEDS[:] = feeds
+        shown = [gui.Article.from_dict(a) for a in arts if not a.get('error')]
+        v.current_articles = shown
+        times = []
+        for _ in range(2):
+            t0 = time.perf_counter()
+            v._populate_tree()
+            while v._populating:
+                v.update()
+            times.append(time.perf_counter() - t0)
+            # Anything else touching the article list would make the timing meaningless
+            assert v.current_articles is shown and not v._populate_again
+            assert all(v.tree.exists(a.id) for a in shown)
+        return times[0], times[1]
+    finally:
+        v.destroy()
+
+
+def run(n, args):
+    servers = [FeedServer(latency=args.latency, n_items=args.items, keep_alive=True, error_rate=args.error_rate,
+                          etag=True, seed=i) for i in range(args.hosts)]
+    reddit = servers[0]
+    app.REDDIT_API = reddit.url('')
+    feeds = make_feeds(n, servers, reddit)
+    try:
+        # As in the app, the cache reuses articles from the store on a 304
+        store = app.ArticleStore(os.path.join(HOME, f'articles{n}.db'))
+        cache = app.FeedCache(os.path.join(HOME, f'cache{n}.json'), articles=store)
+        arts, cold = refresh(feeds, args, cache, servers)
+        store.add(arts)
+        _, warm = refresh(feeds, args, cache, servers)
+        tracemalloc.start()
+        refresh(feeds, args, None, servers)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        for s in servers:
+            s.close()
+
+    path = os.path.join(HOME, 'feeds.json')
+    t0 = time.perf_counter()
+    writer = app.JsonWriter(path)
+    writer.save(feeds)
+    writer.flush()
+    t_save = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    app.load_feeds(path)
+    t_load = time.perf_counter() - t0
+    fill, update = tree_times(feeds, arts)
+    return {
+        'feeds': n,
+        'refresh_s': round(cold['wall'], 4),
+        'items': cold['items'],
+        'items_per_s': round(cold['items'] / cold['wall'], 1),
+        'parse_items_per_s': round(cold['items'] / cold['parse'], 1) if cold['parse'] else None,
+        'errors': cold['errors'],
+        'error_rate': round(cold['errors'] / n, 4),
+        'requests': cold['requests'],
+        'statuses': cold['statuses'],
+        'revalidate_s': round(warm['wall'], 4),
+        'revalidate_requests': warm['requests'],
+        'revalidate_statuses': warm['statuses'],
+        'peak_mb': round(peak / 1e6, 2),
+        'feeds_save_s': round(t_save, 5),
+        'feeds_load_s': round(t_load, 5),
+        'tree_fill_s': None if fill is None else round(fill, 4),
+        'tree_update_s': None if update is None else round(update, 4),
+    }
+
+
+def environment(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, timeout=30).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': commit, 'python': platform.python_version(),
+            'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'params': {k: v for k, v in vars(args).items() if k not in ('out', 'compare')}}
+
+
+def compare(old, new):
+    before = {r['feeds']: r for r in old['results']}
+    print(f"\nvs {old['env'].get('commit')} ({old['env']['time']})")
+    for r in new['results']:
+        o = before.get(r['feeds'])
+        if not o:
+            continue
+        for k in LOWER + ('items_per_s', 'parse_items_per_s'):
+            if o.get(k) and r.get(k) is not None:
+                change = (r[k] - o[k]) / o[k] * 100
+                better = change < 0 if k in LOWER else change > 0
+                print(f"{r['feeds']:6} feeds  {k:18} {o[k]:>12} -> {r[k]:<12} {change:+7.1f}%"
+                      f"{'' if abs(change) < 5 else ' better' if better else ' WORSE'}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    ap.add_argument('--feeds', type=int, nargs='+', default=[10, 100, 1000], help='feed counts to run')
+    ap.add_argument('--items', type=int, default=25, help='items per feed')
+    ap.add_argument('--hosts', type=int, default=10, help='local servers the feeds are spread over')
+    ap.add_argument('--latency', type=float, default=0.05, help='seconds added to every response')
+    ap.add_argument('--error-rate', type=float, default=0.02, help='fraction of requests answered with 503')
+    ap.add_argument('--workers', type=int, default=app.DEFAULT_SETTINGS['max_workers'])
+    ap.add_argument('--per-host', type=int, default=app.DEFAULT_SETTINGS['per_host'])
+    ap.add_argument('--out', default='bench_results.json', help='results file (default: %(default)s)')
+    ap.add_argument('--compare', metavar='OLD', help='earlier results file to compare with')
+    args = ap.parse_args(argv)
+
+    results = {'env': environment(args), 'results': []}
+    print(f'{"feeds":>6} {"refresh s":>9} {"items/s":>8} {"parse/s":>9} {"errors":>6} {"304 s":>7} '
+          f'{"peak MB":>8} {"save ms":>8} {"tree s":>7}')
+    try:
+        for n in args.feeds:
+            r = run(n, args)
+            results['results'].append(r)
+            tree = '-' if r['tree_fill_s'] is None else f"{r['tree_fill_s']:.3f}"
+            print(f"{n:6} {r['refresh_s']:9.2f} {r['items_per_s']:8.0f} {r['parse_items_per_s'] or 0:9.0f} "
+                  f"{r['errors']:6} {r['revalidate_s']:7.2f} {r['peak_mb']:8.1f} {r['feeds_save_s'] * 1000:8.1f} "
+                  f"{tree:>7}", flush=True)
+    finally:
+        shutil.rmtree(HOME, ignore_errors=True)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'results written to {args.out}')
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
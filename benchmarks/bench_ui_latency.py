@@ -0,0 +1,68 @@
+"""UI event latency while a large refresh runs, parsing in threads vs processes.
+
+The main thread plays the Tk event loop: it asks to be woken every 10 ms
+(like after(10, ...)), does a little Python work per tick and records how
+late each wake-up was, while fetch_all() refreshes big feeds from a local
+server on background threads. Compares parsing on the fetch threads with a
+parse_pool() of worker processes.
+Usage: python benchmarks/bench_ui_latency.py [feeds] [items per feed] [processes]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feedcore as app
+from feedserver import FeedServer
+
+
+def tick_loop(stop, period=0.01):
+    late = []
+    due = time.perf_counter() + period
+    while not stop.is_set():
+        time.sleep(max(due - time.perf_counter(), 0))
+        now = time.perf_counter()
+        late.append(now - due)
+        sum(range(2000))  # stand-in for an event handler
+        due = now + period
+    return late
+
+
+def run(feeds, n_items, parser):
+    stop = threading.Event()
+    out = {}
+
+    def refresh():
+        t0 = time.perf_counter()
+        arts = app.fetch_all(feeds, '', n_items, workers=16, per_host=16, parser=parser)
+        out['wall'] = time.perf_counter() - t0
+        out['items'] = sum(not a.get('error') for a in arts)
+        stop.set()
+
+    threading.Thread(target=refresh).start()
+    late = sorted(tick_loop(stop))
+    pct = lambda p: late[min(int(p * len(late)), len(late) - 1)] * 1000
+    return out, pct(0.5), pct(0.95), late[-1] * 1000
+
+
+def main(n_feeds=40, n_items=3000, processes=os.cpu_count() or 2):
+    server = FeedServer(n_items=n_items, keep_alive=True, encoding='gzip')
+    feeds = [{'name': f'feed{i}', 'url': server.url(f'/feed{i}.xml')} for i in range(n_feeds)]
+    pool = app.parse_pool(processes)
+    # Start the workers before measuring, as the app keeps its pool for the session
+    list(pool.map(abs, range(processes)))
+    print(f'{n_feeds} feeds x {n_items} items, {processes} parse processes')
+    print(f'{"":10} {"refresh":>8} {"items":>7} {"p50 ms":>7} {"p95 ms":>7} {"max ms":>7}')
+    try:
+        for label, parser in (('threads', None), ('processes', pool)):
+            out, p50, p95, worst = run(feeds, n_items, parser)
+            print(f'{label:10} {out["wall"]:7.2f}s {out["items"]:7} {p50:7.1f} {p95:7.1f} {worst:7.1f}')
+    finally:
+        pool.shutdown()
+        server.close()
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
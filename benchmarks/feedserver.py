@@ -0,0 +1,184 @@
+"""Local stand-in feed server used by the benchmarks."""
+import gzip
+import json
+import random
+import socket
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def make_rss(n_items=20, title='Bench'):
+    items = ''.join(
+        f'<item><title>{title} item {i}</title>'
+        f'<link>http://example.invalid/{title}/{i}</link>'
+        f'<description>&lt;p&gt;Body of item {i}&lt;/p&gt;</description>'
+        f'<pubDate>2025-05-01T12:00:{i % 60:02d}Z</pubDate></item>'
+        for i in range(n_items))
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>{title}</title>{items}</channel></rss>'.encode()
+
+
+def make_atom(n_items=20, title='Bench'):
+    entries = ''.join(
+        f'<entry><title>{title} entry {i}</title>'
+        f'<link rel="alternate" href="http://example.invalid/{title}/{i}"/>'
+        f'<id>urn:bench:{title}:{i}</id><updated>2025-05-01T12:00:{i % 60:02d}Z</updated>'
+        f'<summary>Summary of entry {i}</summary>'
+        f'<content type="html">&lt;p&gt;Body of entry {i}&lt;/p&gt;</content></entry>'
+        for i in range(n_items))
+    return (f'<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom">'
+            f'<title>{title}</title>{entries}</feed>').encode()
+
+
+def make_rdf(n_items=20, title='Bench'):
+    items = ''.join(
+        f'<item rdf:about="http://example.invalid/{title}/{i}"><title>{title} item {i}</title>'
+        f'<link>http://example.invalid/{title}/{i}</link>'
+        f'<description>Body of item {i}</description>'
+        f'<content:encoded>&lt;p&gt;Body of item {i}&lt;/p&gt;</content:encoded>'
+        f'<dc:date>2025-05-01T12:00:{i % 60:02d}Z</dc:date></item>'
+        for i in range(n_items))
+    return ('<?xml version="1.0"?><rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" '
+            'xmlns="http://purl.org/rss/1.0/" xmlns:dc="http://purl.org/dc/elements/1.1/" '
+            'xmlns:content="http://purl.org/rss/1.0/modules/content/">'
+            f'<channel rdf:about="http://example.invalid/{title}"><title>{title}</title></channel>'
+            f'{items}</rdf:RDF>').encode()
+
+
+def make_reddit(n_items=20, title='Bench'):
+    posts = [{'kind': 't3', 'data': {'name': f't3_{title}{i}', 'title': f'{title} post {i}',
+                                     'selftext': f'Body of post {i}', 'url': f'http://example.invalid/{title}/{i}',
+                                     'created_utc': 1746100800.0 + i}}
+             for i in range(n_items)]
+    return json.dumps({'kind': 'Listing', 'data': {'children': posts}}).encode()
+
+
+FORMATS = {'rss': (make_rss, 'application/rss+xml'), 'atom': (make_atom, 'application/atom+xml'),
+           'rdf': (make_rdf, 'application/rdf+xml'), 'reddit': (make_reddit, 'application/json')}
+
+
+class FeedServer:
+    """Serves synthetic feeds on 127.0.0.1 with a fixed injected latency per request.
+
+    Any path gets the same RSS body; feed_url() paths get a body of their own
+    per format and name, Reddit listings included (/r/<name>/new.json, for
+    feedcore.REDDIT_API pointed here).
+
+    With `keep_alive` the server speaks HTTP/1.1 and keeps connections open;
+    `connections` counts accepted TCP connections, `requests` the requests and
+    `statuses` the responses by status code. `encoding` ('gzip' or 'deflate')
+    compresses bodies for clients that accept it. `error_rate` of requests
+    fail with a 503, and with `etag` bodies carry an ETag and no freshness,
+    so clients revalidate and get a 304.
+    """
+    def __init__(self, latency=0.0, n_items=20, keep_alive=False, encoding=None, error_rate=0.0, etag=False,
+                 seed=0):
+        self.latency = latency
+        self.n_items = n_items
+        self.body = make_rss(n_items)
+        self.bodies = {}
+        self.encoding = encoding
+        self.error_rate = error_rate
+        self.etag = etag
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.connections = 0
+        self.statuses = {}
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' if keep_alive else 'HTTP/1.0'
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out as separate writes; don't let Nagle stall keep-alive
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with server.lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                with server.lock:
+                    server.requests += 1
+                    failed = server.random.random() < server.error_rate
+                time.sleep(server.latency)
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                agent = query.get('ua', [''])[0]
+                if failed:
+                    return self.reply(503)
+                if agent not in (self.headers.get('User-Agent') or ''):
+                    # Only lets in clients whose User-Agent contains the ?ua= value
+                    return self.reply(403)
+                body, ctype = server.feed(url.path)
+                tag = f'"{zlib.crc32(body):08x}"' if server.etag else None
+                if tag and self.headers.get('If-None-Match') == tag:
+                    return self.reply(304, headers={'ETag': tag})
+                enc = 'gzip' if 'gz' in query else server.encoding
+                if enc and enc in (self.headers.get('Accept-Encoding') or ''):
+                    body = gzip.compress(body) if enc == 'gzip' else zlib.compress(body)
+                else:
+                    enc = None
+                headers = {'Content-Type': ctype}
+                if enc:
+                    headers['Content-Encoding'] = enc
+                if tag:
+                    headers.update({'ETag': tag, 'Cache-Control': 'no-cache'})
+                self.reply(200, body, headers)
+
+            def reply(self, status, body=b'', headers=None):
+                with server.lock:
+                    server.statuses[status] = server.statuses.get(status, 0) + 1
+                self.send_response(status)
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def feed(self, path):
+        """(body, content type) for a request path."""
+        parts = path.strip('/').split('/')
+        if len(parts) == 3 and parts[0] == 'r' and parts[2] == 'new.json':
+            kind, name = 'reddit', parts[1]
+        elif len(parts) == 2 and parts[0] in FORMATS:
+            kind, name = parts
+        else:
+            return self.body, 'application/rss+xml'
+        with self.lock:
+            body = self.bodies.get((kind, name))
+        if body is None:
+            body = FORMATS[kind][0](self.n_items, name)
+            with self.lock:
+                self.bodies[kind, name] = body
+        return body, FORMATS[kind][1]
+
+    def url(self, path='/feed.xml'):
+        return f'http://127.0.0.1:{self.port}{path}'
+
+    def feed_url(self, kind, name, gzip=False, agent=None):
+        """URL of feed `name` in format `kind` ('rss', 'atom', 'rdf' or 'reddit').
+
+        Reddit feeds get the subreddit RSS URL the app rewrites to a JSON
+        listing. `gzip` compresses the body even without a server-wide
+        encoding; `agent` makes the feed 403 any User-Agent not containing it.
+        """
+        query = '&'.join(([f'ua={agent}'] if agent else []) + (['gz=1'] if gzip else []))
+        if kind == 'reddit':
+            # Query flags don't survive the rewrite to the JSON listing
+            return f'https://www.reddit.com/r/{name}/.rss'
+        return self.url(f'/{kind}/{name}' + ('?' + query if query else ''))
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()